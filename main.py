@@ -10,6 +10,12 @@ Terminal 1: python main.py --host
 Terminal 2: python main.py --join
 
 Clipboard is automatically synced across all connected devices!
+
+Optional: --warm-pool N keeps N peer connections with a local offer and
+gathered ICE candidates ready. Only connections this device initiates can
+use them, i.e. to devices that join after it (on the host: every device).
+A device joining a populated room answers all existing peers, and those
+answers are set up concurrently instead.
 """
 
 import asyncio
@@ -21,6 +27,8 @@ from aiohttp import web
 from aiortc import RTCPeerConnection, RTCSessionDescription, RTCIceCandidate
 import pyperclip
 import hashlib
+import time
+from aiortc.sdp import candidate_from_sdp
 
 
 # ============= SIGNALING SERVER (runs in host mode) =============
@@ -127,10 +135,81 @@ class SignalingServer:
 
 
 
+# ============= PRE-WARMED PEER CONNECTIONS =============
+class PeerConnectionPool:
+    """Keeps RTCPeerConnections with a local offer and gathered ICE candidates ready
+
+    A warm connection already holds a local offer, so it can only be used
+    when we initiate; aiortc has no rollback to turn it into an answerer.
+    """
+    def __init__(self, size):
+        self.size = size
+        self.ready = []  # [(RTCPeerConnection, DataChannel)]
+        self.warming = set()
+    
+    def fill(self):
+        """Start warming connections until the pool is back to full size"""
+        missing = self.size - len(self.ready) - len(self.warming)
+        for _ in range(missing):
+            task = asyncio.create_task(self.warm())
+            self.warming.add(task)
+            task.add_done_callback(self.warming.discard)
+    
+    async def warm(self, max_attempts=3):
+        """Warm one connection, retrying with a growing delay if gathering fails"""
+        for attempt in range(1, max_attempts + 1):
+            if await self.warm_once():
+                return
+            if attempt < max_attempts:
+                await asyncio.sleep(attempt)
+        print(f"\n[Pool] Warm-up failed {max_attempts} times; pool is below its size of {self.size}")
+    
+    async def warm_once(self):
+        pc = RTCPeerConnection()
+        channel = pc.createDataChannel("chat")
+        try:
+            # setLocalDescription waits for ICE gathering to complete
+            offer = await pc.createOffer()
+            await pc.setLocalDescription(offer)
+            self.ready.append((pc, channel))
+            return True
+        except Exception as e:
+            print(f"\n[Pool Error]: {e}")
+            return False
+        finally:
+            # Also runs on cancellation, so a half-gathered pc never leaks its sockets
+            if (pc, channel) not in self.ready:
+                await pc.close()
+    
+    def take(self):
+        """Return a warm (pc, channel) pair, or None if none is ready yet"""
+        if not self.ready:
+            return None
+        entry = self.ready.pop()
+        self.fill()
+        return entry
+    
+    async def close(self):
+        tasks = list(self.warming)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for pc, channel in self.ready:
+            channel.close()
+            await pc.close()
+        self.ready.clear()
+
+
+
 # ============= WEBRTC CHAT CLIENT (Multi-Peer Support) =============
 class WebRTCChat:
-    def __init__(self):
-        self.peer_connections = {}  # {peer_id: {'pc': RTCPeerConnection, 'channel': DataChannel}}
+    def __init__(self, warm_pool_size=0):
+        self.peer_connections = {}  # {peer_id: {'pc': RTCPeerConnection, 'channel': DataChannel, 'started': float}}
+        self.room_peers = {}  # {peer_id: monotonic time we learned of it via 'joined'/'peer_joined'}
+        self.pending_candidates = {}  # {peer_id: [RTCIceCandidate]} received before the remote description
+        self.peer_locks = {}  # {peer_id: asyncio.Lock} keeps each peer's signaling steps in order; kept after the peer leaves
+        self.signaling_tasks = set()
+        self.pool = PeerConnectionPool(warm_pool_size) if warm_pool_size > 0 else None
         self.ws = None
         self.my_peer_id = None
         self.last_clipboard_hash = None
@@ -192,11 +271,14 @@ class WebRTCChat:
             print(f"\n[Clipboard Error]: {e}")
     
     async def connect_signaling(self, room_code, server_url='http://localhost:8080'):
+        if self.pool:
+            # Start gathering candidates while we connect to the signaling server
+            self.pool.fill()
+        
         session = aiohttp.ClientSession()
         self.ws = await session.ws_connect(f'{server_url}/ws')
         
         # Generate peer ID in same format as mobile app
-        import time
         timestamp = int(time.time() * 1000)
         random_str = ''.join(random.choices('abcdefghijklmnopqrstuvwxyz0123456789', k=9))
         self.my_peer_id = f"peer-{timestamp}-{random_str}"
@@ -221,14 +303,16 @@ class WebRTCChat:
                         print("[Waiting for peers...]")
                     else:
                         print(f"[Found {len(existing_peers)} peer(s)!]")
-                        # Create connections to existing peers
+                        joined_at = time.monotonic()
+                        self.room_peers.update((peer_id, joined_at) for peer_id in existing_peers)
+                        # Set up connections to existing peers concurrently
                         for peer_id in existing_peers:
-                            should_initiate = self.my_peer_id < peer_id
-                            if should_initiate:
-                                await self.create_peer_connection(peer_id, is_initiator=True)
+                            if self.my_peer_id < peer_id:
+                                self.schedule_peer_task(peer_id, self.create_peer_connection(peer_id, is_initiator=True))
                 
                 elif data['type'] == 'peer_joined':
                     peer_id = data.get('peerId')
+                    self.room_peers[peer_id] = time.monotonic()
                     print(f"\n[Peer {peer_id[:8]}... joined]")
                     print(">> ", end='', flush=True)
                     
@@ -236,23 +320,23 @@ class WebRTCChat:
                     should_initiate = self.my_peer_id < peer_id
                     if should_initiate:
                         print(f"[Creating connection to {peer_id[:8]}...]")
-                        await self.create_peer_connection(peer_id, is_initiator=True)
+                        self.schedule_peer_task(peer_id, self.create_peer_connection(peer_id, is_initiator=True))
                     else:
                         print(f"[Waiting for connection from {peer_id[:8]}...]")
                 
                 elif data['type'] == 'offer':
                     from_peer = data.get('fromPeer')
-                    if from_peer not in self.peer_connections:
-                        await self.create_peer_connection(from_peer, is_initiator=False)
-                    await self.handle_offer(from_peer, data['sdp'])
+                    self.room_peers.setdefault(from_peer, time.monotonic())
+                    self.schedule_peer_task(from_peer, self.handle_offer(from_peer, data['sdp']))
                 
                 elif data['type'] == 'answer':
                     from_peer = data.get('fromPeer')
-                    await self.handle_answer(from_peer, data['sdp'])
+                    self.schedule_peer_task(from_peer, self.handle_answer(from_peer, data['sdp']))
                 
                 elif data['type'] == 'ice':
                     from_peer = data.get('fromPeer')
-                    if from_peer in self.peer_connections and data.get('candidate'):
+                    known_peer = from_peer in self.room_peers or from_peer in self.peer_connections
+                    if known_peer and data.get('candidate'):
                         cand_data = data['candidate']
                         candidate_str = cand_data.get('candidate')
                         sdp_mid = cand_data.get('sdpMid')
@@ -265,20 +349,40 @@ class WebRTCChat:
                             # Basic parsing relying on standard candidate format
                             # candidate:foundation component protocol priority ip port typ type ...
                             if len(parts) >= 8:
-                                from aiortc.sdp import candidate_from_sdp
                                 candidate = candidate_from_sdp(candidate_str)
                                 candidate.sdpMid = sdp_mid
                                 candidate.sdpMLineIndex = sdp_mline_index
                                 
-                                pc = self.peer_connections[from_peer]['pc']
-                                await pc.addIceCandidate(candidate)
+                                # Buffer until the remote description is set, then apply as a batch
+                                self.pending_candidates.setdefault(from_peer, []).append(candidate)
+                                self.schedule_peer_task(from_peer, self.apply_pending_candidates(from_peer))
                 
                 elif data['type'] == 'peer_left':
                     peer_id = data.get('peerId')
                     print(f"\n[Peer {peer_id[:8]}... left]")
                     print(">> ", end='', flush=True)
-                    if peer_id in self.peer_connections:
-                        await self.remove_peer(peer_id)
+                    self.room_peers.pop(peer_id, None)
+                    self.pending_candidates.pop(peer_id, None)
+                    self.schedule_peer_task(peer_id, self.remove_peer(peer_id))
+    
+    def schedule_peer_task(self, peer_id, coro):
+        """Run a signaling step without blocking the loop; steps for one peer stay in order"""
+        task = asyncio.create_task(self.run_peer_task(peer_id, coro))
+        self.signaling_tasks.add(task)
+        task.add_done_callback(self.signaling_tasks.discard)
+        return task
+    
+    async def run_peer_task(self, peer_id, coro):
+        # asyncio.Lock wakes waiters in FIFO order, so steps run in arrival order
+        lock = self.peer_locks.setdefault(peer_id, asyncio.Lock())
+        try:
+            async with lock:
+                await coro
+        except Exception as e:
+            print(f"\n[Signaling Error with {peer_id[:8]}...]: {e}")
+        finally:
+            # No-op if it ran; avoids "never awaited" warnings if cancelled while queued
+            coro.close()
     
     async def create_peer_connection(self, peer_id, is_initiator):
         if peer_id in self.peer_connections:
@@ -286,8 +390,12 @@ class WebRTCChat:
         
         print(f"[Creating peer connection to {peer_id[:8]}... (initiator: {is_initiator})]")
         
-        pc = RTCPeerConnection()
-        peer_info = {'pc': pc, 'channel': None}
+        # Only initiators can use a warm connection: it already holds a local offer
+        warm = self.pool.take() if self.pool and is_initiator else None
+        pc, channel = warm if warm else (RTCPeerConnection(), None)
+        # Time from when we joined (or the peer joined), not from when the offer arrived
+        started = self.room_peers.get(peer_id, time.monotonic())
+        peer_info = {'pc': pc, 'channel': None, 'started': started}
         self.peer_connections[peer_id] = peer_info
         
         # Handle ICE candidates
@@ -305,14 +413,16 @@ class WebRTCChat:
                 })
         
         if is_initiator:
-            # Create data channel
-            channel = pc.createDataChannel("chat")
+            if not warm:
+                # Create data channel
+                channel = pc.createDataChannel("chat")
             peer_info['channel'] = channel
             self.setup_channel(peer_id, channel)
             
-            # Create and send offer
-            offer = await pc.createOffer()
-            await pc.setLocalDescription(offer)
+            if not warm:
+                # Create offer (gathers ICE candidates)
+                offer = await pc.createOffer()
+                await pc.setLocalDescription(offer)
             
             await self.ws.send_json({
                 'type': 'offer',
@@ -327,9 +437,12 @@ class WebRTCChat:
                 self.setup_channel(peer_id, channel)
     
     async def handle_offer(self, from_peer, sdp):
+        if from_peer not in self.peer_connections:
+            await self.create_peer_connection(from_peer, is_initiator=False)
         pc = self.peer_connections[from_peer]['pc']
         
         await pc.setRemoteDescription(RTCSessionDescription(sdp=sdp['sdp'], type=sdp['type']))
+        await self.apply_pending_candidates(from_peer)
         answer = await pc.createAnswer()
         await pc.setLocalDescription(answer)
         
@@ -342,11 +455,30 @@ class WebRTCChat:
     async def handle_answer(self, from_peer, sdp):
         pc = self.peer_connections[from_peer]['pc']
         await pc.setRemoteDescription(RTCSessionDescription(sdp=sdp['sdp'], type=sdp['type']))
+        await self.apply_pending_candidates(from_peer)
+    
+    async def apply_pending_candidates(self, peer_id):
+        """Add all buffered ICE candidates for a peer in one batch once its remote description is set"""
+        peer_info = self.peer_connections.get(peer_id)
+        if not peer_info or not peer_info['pc'].remoteDescription:
+            return
+        candidates = self.pending_candidates.pop(peer_id, [])
+        if candidates:
+            pc = peer_info['pc']
+            results = await asyncio.gather(*[pc.addIceCandidate(c) for c in candidates], return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    print(f"\n[ICE Error with {peer_id[:8]}...]: {result}")
     
     def setup_channel(self, peer_id, channel):
         @channel.on("open")
         def on_open():
-            print(f"\n✓ Connected to peer {peer_id[:8]}...!")
+            peer_info = self.peer_connections.get(peer_id)
+            if peer_info:
+                elapsed_ms = (time.monotonic() - peer_info['started']) * 1000
+                print(f"\n✓ Connected to peer {peer_id[:8]}...! (time to first sync: {elapsed_ms:.0f} ms)")
+            else:
+                print(f"\n✓ Connected to peer {peer_id[:8]}...!")
             print(f"[Total connections: {self.get_connected_count()}]")
             print(">> ", end='', flush=True)
         
@@ -377,8 +509,13 @@ class WebRTCChat:
                 peer_info['channel'].close()
             await peer_info['pc'].close()
             del self.peer_connections[peer_id]
+        self.pending_candidates.pop(peer_id, None)
     
     async def close(self):
+        tasks = list(self.signaling_tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
         if self.ws:
             await self.ws.close()
         for peer_info in self.peer_connections.values():
@@ -386,11 +523,15 @@ class WebRTCChat:
                 peer_info['channel'].close()
             await peer_info['pc'].close()
         self.peer_connections.clear()
+        self.pending_candidates.clear()
+        self.peer_locks.clear()
+        if self.pool:
+            await self.pool.close()
 
 
 
 # ============= MAIN APPLICATION =============
-async def run_host():
+async def run_host(warm_pool_size=0):
     print("=== HOST MODE ===\n")
     
     # Start signaling server
@@ -403,7 +544,7 @@ async def run_host():
     print("★ Share this code with the other peer!\n")
     
     # Start chat client
-    chat = WebRTCChat()
+    chat = WebRTCChat(warm_pool_size)
     session = await chat.connect_signaling(room_code)
     
     await asyncio.sleep(1)
@@ -423,7 +564,7 @@ async def run_host():
         await server.stop()
 
 
-async def run_join():
+async def run_join(warm_pool_size=0):
     print("=== JOIN MODE ===\n")
     
     server_ip = input("Enter host IP address (or press Enter for localhost): ").strip()
@@ -435,7 +576,7 @@ async def run_join():
     server_url = f"http://{server_ip}:8080"
     print(f"\n[Connecting to {server_url}...]\n")
     
-    chat = WebRTCChat()
+    chat = WebRTCChat(warm_pool_size)
     session = await chat.connect_signaling(room_code, server_url)
     
     await asyncio.sleep(1)
@@ -459,13 +600,15 @@ async def main():
     group = parser.add_mutually_exclusive_group(required=True)
     group.add_argument('--host', action='store_true', help='Host mode (creates room)')
     group.add_argument('--join', action='store_true', help='Join mode (joins room)')
+    parser.add_argument('--warm-pool', type=int, default=0, metavar='N',
+                        help='Keep N pre-warmed connections for peers that join after us (default: 0)')
     
     args = parser.parse_args()
     
     if args.host:
-        await run_host()
+        await run_host(args.warm_pool)
     else:
-        await run_join()
+        await run_join(args.warm_pool)
 
 
 if __name__ == "__main__":
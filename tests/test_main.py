@@ -0,0 +1,206 @@
+import asyncio
+import json
+import time
+from unittest import mock
+
+import aiohttp
+
+import main
+
+
+GATHER_DELAY = 0.2
+CANDIDATE = 'candidate:1 1 udp 2122260223 192.168.1.2 54321 typ host'
+
+
+class FakeChannel:
+    readyState = 'connecting'
+
+    def on(self, event):
+        return lambda handler: handler
+
+    def close(self):
+        pass
+
+
+class FakePeerConnection:
+    """Stands in for RTCPeerConnection; setLocalDescription sleeps like ICE gathering does"""
+    active = 0
+    max_active = 0
+    failures = 0
+
+    def __init__(self):
+        self.localDescription = None
+        self.remoteDescription = None
+        self.events = []
+
+    def on(self, event):
+        return lambda handler: handler
+
+    def createDataChannel(self, label):
+        return FakeChannel()
+
+    async def createOffer(self):
+        return main.RTCSessionDescription(sdp='offer', type='offer')
+
+    async def createAnswer(self):
+        return main.RTCSessionDescription(sdp='answer', type='answer')
+
+    async def setLocalDescription(self, description):
+        if FakePeerConnection.failures:
+            FakePeerConnection.failures -= 1
+            raise RuntimeError('gathering failed')
+        FakePeerConnection.active += 1
+        FakePeerConnection.max_active = max(FakePeerConnection.max_active, FakePeerConnection.active)
+        await asyncio.sleep(GATHER_DELAY)
+        FakePeerConnection.active -= 1
+        self.localDescription = description
+
+    async def setRemoteDescription(self, description):
+        self.events.append('remote')
+        self.remoteDescription = description
+
+    async def addIceCandidate(self, candidate):
+        if candidate.port == 1:
+            raise ValueError('bad candidate')
+        self.events.append('candidate')
+
+    async def close(self):
+        pass
+
+
+class FakeWebSocket:
+    def __init__(self, messages):
+        self.messages = messages
+        self.sent = []
+
+    async def send_json(self, data):
+        self.sent.append(data)
+
+    async def __aiter__(self):
+        for message in self.messages:
+            if isinstance(message, float):
+                # Simulate a delay on the signaling server
+                await asyncio.sleep(message)
+                continue
+            yield mock.Mock(type=aiohttp.WSMsgType.TEXT, data=json.dumps(message))
+
+
+def run_signaling(my_peer_id, messages):
+    FakePeerConnection.active = 0
+    FakePeerConnection.max_active = 0
+
+    async def scenario():
+        chat = main.WebRTCChat()
+        chat.my_peer_id = my_peer_id
+        chat.ws = FakeWebSocket(messages)
+        started = time.monotonic()
+        await chat.handle_signaling()
+        while chat.signaling_tasks:
+            await asyncio.gather(*chat.signaling_tasks)
+        return chat, started
+
+    with mock.patch.object(main, 'RTCPeerConnection', FakePeerConnection):
+        return asyncio.run(scenario())
+
+
+def ice(from_peer, candidate=CANDIDATE):
+    return {'type': 'ice', 'fromPeer': from_peer,
+            'candidate': {'candidate': candidate, 'sdpMid': '0', 'sdpMLineIndex': 0}}
+
+
+def test_joiner_answers_existing_peers_concurrently():
+    peers = [f'peer-1000-{i}' for i in range(5)]
+    messages = [{'type': 'joined', 'myId': 'peer-2000-me', 'peers': peers, 'peerCount': 6}]
+    messages += [{'type': 'offer', 'fromPeer': p, 'sdp': {'type': 'offer', 'sdp': 'offer'}} for p in peers]
+
+    chat, _ = run_signaling('peer-2000-me', messages)
+
+    answers = [m for m in chat.ws.sent if m['type'] == 'answer']
+    assert sorted(m['targetPeer'] for m in answers) == peers
+    assert FakePeerConnection.max_active == len(peers)
+
+
+def test_initiator_offers_to_peers_concurrently():
+    peers = [f'peer-3000-{i}' for i in range(5)]
+    messages = [{'type': 'joined', 'myId': 'peer-1000-me', 'peers': peers, 'peerCount': 6}]
+
+    chat, _ = run_signaling('peer-1000-me', messages)
+
+    offers = [m for m in chat.ws.sent if m['type'] == 'offer']
+    assert sorted(m['targetPeer'] for m in offers) == peers
+    assert FakePeerConnection.max_active == len(peers)
+
+
+def test_candidates_buffered_until_remote_description():
+    peer = 'peer-1000-a'
+    messages = [
+        {'type': 'joined', 'myId': 'peer-2000-me', 'peers': [peer], 'peerCount': 2},
+        ice(peer),
+        ice(peer),
+        {'type': 'offer', 'fromPeer': peer, 'sdp': {'type': 'offer', 'sdp': 'offer'}},
+        ice(peer),
+    ]
+
+    chat, _ = run_signaling('peer-2000-me', messages)
+
+    pc = chat.peer_connections[peer]['pc']
+    assert pc.events == ['remote', 'candidate', 'candidate', 'candidate']
+    assert peer not in chat.pending_candidates
+
+
+def test_bad_candidate_does_not_abort_answer():
+    peer = 'peer-1000-a'
+    messages = [
+        {'type': 'joined', 'myId': 'peer-2000-me', 'peers': [peer], 'peerCount': 2},
+        ice(peer, 'candidate:1 1 udp 2122260223 192.168.1.2 1 typ host'),
+        ice(peer),
+        {'type': 'offer', 'fromPeer': peer, 'sdp': {'type': 'offer', 'sdp': 'offer'}},
+    ]
+
+    chat, _ = run_signaling('peer-2000-me', messages)
+
+    assert [m['type'] for m in chat.ws.sent] == ['answer']
+    assert chat.peer_connections[peer]['pc'].events == ['remote', 'candidate']
+
+
+def test_candidates_from_unknown_or_departed_peers_are_dropped():
+    messages = [
+        {'type': 'joined', 'myId': 'peer-2000-me', 'peers': ['peer-1000-a'], 'peerCount': 2},
+        ice('peer-9999-stranger'),
+        ice('peer-1000-a'),
+        {'type': 'peer_left', 'peerId': 'peer-1000-a'},
+    ]
+
+    chat, _ = run_signaling('peer-2000-me', messages)
+
+    assert chat.pending_candidates == {}
+
+
+def test_setup_time_starts_when_joined():
+    peer = 'peer-1000-a'
+    messages = [
+        {'type': 'joined', 'myId': 'peer-2000-me', 'peers': [peer], 'peerCount': 2},
+        GATHER_DELAY,
+        {'type': 'offer', 'fromPeer': peer, 'sdp': {'type': 'offer', 'sdp': 'offer'}},
+    ]
+
+    chat, started = run_signaling('peer-2000-me', messages)
+
+    # The clock starts at 'joined', before the offer's round-trip
+    assert chat.peer_connections[peer]['started'] < started + GATHER_DELAY
+
+
+def test_pool_retries_failed_warm_up():
+    FakePeerConnection.failures = 1
+
+    async def scenario():
+        pool = main.PeerConnectionPool(1)
+        with mock.patch.object(main.asyncio, 'sleep', mock.AsyncMock()):
+            await pool.warm()
+        return pool
+
+    with mock.patch.object(main, 'RTCPeerConnection', FakePeerConnection):
+        pool = asyncio.run(scenario())
+
+    assert len(pool.ready) == 1
+    assert FakePeerConnection.failures == 0